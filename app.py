@@ -4,52 +4,299 @@
 #            Two workers × RDKit ≈ 240 MB → OOM crash.
 # Author: Dr. Luqman Bin Fahad, Doctor of Pharmacy
 
-import math
+# gevent must patch sockets/threads before requests, urllib3 or threading load.
+# gunicorn.conf.py sets GUNICORN_WORKER=gevent; plain `python app.py` and test
+# runs leave the stdlib untouched.
 import os
+_GEVENT = os.environ.get("GUNICORN_WORKER") == "gevent"
+if _GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+
+import atexit
+import functools
+import importlib
+import io
+import json
+import math
+import queue
 import re
+import secrets
 import time
 import logging
+import logging.handlers
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType, SimpleNamespace
 from urllib.parse import quote
 
 import requests
-from cachetools import LRUCache
-from flask import Flask, render_template, request, jsonify
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import (
-    HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
-)
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from cachetools import LRUCache, TTLCache
+from flask import Flask, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache
 
 try:
     from rdkit import Chem, DataStructs
-    from rdkit.Chem import rdMolDescriptors
+    from rdkit.Chem import rdFingerprintGenerator
     RDKIT_AVAILABLE = True
 except ImportError:
     RDKIT_AVAILABLE = False
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+try:
+    import orjson
+    _json_loads = orjson.loads          # SIMD parser; accepts bytes directly
+    _json_dumps = orjson.dumps          # bytes out — what Redis stores anyway
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+    ORJSON_AVAILABLE = False
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Request paths only enqueue log records; a QueueListener thread (a greenlet
+# under gevent) does the stream writes, so a burst of outage warnings never
+# blocks a request on stderr, and no level waits behind a buffer. QueueHandler
+# formats before enqueueing, so the format lives on it, not the stream handler.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+logging.basicConfig(level=logging.INFO,
+                    format="%(asctime)s %(levelname)s %(message)s",
+                    handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)     # drain what is queued on clean exit
+logging.getLogger("urllib3").setLevel(logging.WARNING)
 log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """jsonify / request.get_json via orjson; stdlib path for anything it rejects."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+if ORJSON_AVAILABLE:
+    app.json = ORJSONProvider(app)
+
+
+def _json_default(o):
+    """Serialise the read-only views shared out of module-level constants."""
+    if isinstance(o, MappingProxyType):
+        return dict(o)
+    return DefaultJSONProvider.default(o)
+
+
+app.json.default = _json_default
+
+# Compiled templates persist to disk so a freshly forked / restarted worker
+# skips the Jinja parse + compile on its first render. Templates only change
+# on deploy, so the per-render mtime check is switched off as well.
+# Jinja unmarshals code from this directory, so without JINJA_CACHE_DIR it
+# picks its own per-user temp dir and checks it is 0700 and owned by us.
+_JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR")
+if _JINJA_CACHE_DIR:
+    os.makedirs(_JINJA_CACHE_DIR, mode=0o700, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=_JINJA_CACHE_DIR)
+app.jinja_env.auto_reload    = False
+# Load (and compile) every template, the shared base layout included, when
+# each worker imports the app, so no visitor pays for the first parse.
+for _tpl in ("base.html", "index.html", "results.html", "compare.html"):
+    app.jinja_env.get_template(_tpl)
+# Never pretty-print JSON responses, even if debug gets switched on
+# (orjson output is always compact anyway).
+app.json.compact = True
+
 # ── LRU Caches ────────────────────────────────────────────────────────────────
 # maxsize is entry count, not bytes.
 # Estimated per-entry size: pubchem ~1 KB, chembl ~6 KB, ct ~10 KB, ot ~2 KB,
-# score ~300 B, interact ~1 KB, cas ~30 B.
-# Total ceiling at capacity: ≈ 3.5 MB — negligible vs 512 MB budget.
+# score ~300 B, cas ~30 B. (Curated interactions are static — no cache needed.)
+# Total ceiling at capacity: ≈ 3.4 MB — negligible vs 512 MB budget.
 _lock           = threading.Lock()
 _pubchem_cache  = LRUCache(maxsize=256)
 _chembl_cache   = LRUCache(maxsize=128)
 _ct_cache       = LRUCache(maxsize=128)
 _ot_cache       = LRUCache(maxsize=256)
 _score_cache    = LRUCache(maxsize=512)
-_interact_cache = LRUCache(maxsize=128)
 _cas_cache      = LRUCache(maxsize=256)
 
+# ── Shared L2 cache (optional) ────────────────────────────────────────────────
+# The LRUs above are per-process and die with the worker. When REDIS_URL is set
+# (and redis-py is installed) every cache write is mirrored to Redis and L1
+# misses fall through to it, so restarts and sibling workers start warm.
+# Redis failures are logged and treated as misses — never fatal.
+# Run the Redis instance with `maxmemory-policy allkeys-lfu` so popular drugs
+# survive memory pressure; that is server config, not something set from here.
+#
+# Redis TTL policy per data type (L1 LRUs hold everything but SHORT entries):
+#   SHORT   fallback payloads — retry upstream soon after an outage
+#   NORMAL  trials, Open Targets, scores — change on a days-to-weeks scale
+#   LONG    PubChem properties, ChEMBL, CAS — near-static
+CACHE_SHORT  = 60
+CACHE_NORMAL = 86400
+CACHE_LONG   = 604800
+# L1 home for SHORT entries (fallbacks and stale payloads served during an
+# outage). They expire here too, so the first request after CACHE_SHORT goes
+# back upstream instead of the LRU pinning the degraded answer indefinitely.
+_short_cache = TTLCache(maxsize=256, ttl=CACHE_SHORT)
+_REDIS_PREFIX = "drp:"
+# Last good upstream payload per key, kept without TTL (LFU evicts it) and
+# served when a fresh fetch falls back — stale-while-error.
+_STALE_PREFIX = _REDIS_PREFIX + "stale:"
+_redis = (
+    redis.Redis.from_url(os.environ["REDIS_URL"],
+                         socket_timeout=0.5, socket_connect_timeout=0.5)
+    if REDIS_AVAILABLE and os.environ.get("REDIS_URL") else None
+)
+
+
+def _canon_name(name: str) -> str:
+    """Cache-key form of a user-supplied name: case-folded, whitespace collapsed,
+    so 'Metformin', 'metformin' and ' Metformin ' share one entry."""
+    return " ".join(name.split()).lower()
+
+
+def _l1_set(cache: LRUCache, key: str, value, short: bool) -> None:
+    with _lock:
+        if short:
+            cache.pop(key, None)
+            _short_cache[key] = value
+        else:
+            _short_cache.pop(key, None)
+            cache[key] = value
+
+
+def _cache_get(cache: LRUCache, key: str):
+    """L1 lookup, then Redis. Returns None on miss."""
+    with _lock:
+        value = cache.get(key)
+        if value is None:
+            value = _short_cache.get(key)
+    if value is not None or _redis is None:
+        return value
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        pipe.get(_REDIS_PREFIX + key)
+        pipe.ttl(_REDIS_PREFIX + key)
+        raw, remaining = pipe.execute()
+    except redis.RedisError as exc:
+        log.warning("Redis GET %s: %s", key, exc)
+        return None
+    if raw is None:
+        return None
+    value = _json_loads(raw)
+    _l1_set(cache, key, value, short=0 <= remaining <= CACHE_SHORT)
+    return value
+
+
+# Results built, wholly or partly, from fallback data: cached SHORT and never
+# kept as the last good payload.
+_FALLBACK_SOURCES = frozenset(("fallback", "partial_fallback"))
+
+
+def _is_fallback(value) -> bool:
+    return isinstance(value, dict) and value.get("source") in _FALLBACK_SOURCES
+
+
+def _cache_set(cache: LRUCache, key: str, value, ttl: int = CACHE_NORMAL,
+               stale: bool = False) -> None:
+    """Write L1 + Redis. stale=True also keeps a TTL-less last-good copy; pass
+    it for any key _single_flight serves, since only it reads those copies back."""
+    fallback = _is_fallback(value)
+    short    = fallback or ttl <= CACHE_SHORT
+    _l1_set(cache, key, value, short=short)
+    if _redis is None:
+        return
+    try:
+        raw  = _json_dumps(value)
+        pipe = _redis.pipeline(transaction=False)
+        pipe.set(_REDIS_PREFIX + key, raw, ex=CACHE_SHORT if fallback else ttl)
+        if stale and not short:
+            pipe.set(_STALE_PREFIX + key, raw)
+        pipe.execute()
+    except redis.RedisError as exc:
+        log.warning("Redis SET %s: %s", key, exc)
+
+
+def _stale_get(key: str):
+    """Last good payload for key from Redis, or None."""
+    if _redis is None:
+        return None
+    try:
+        raw = _redis.get(_STALE_PREFIX + key)
+    except redis.RedisError as exc:
+        log.warning("Redis GET stale %s: %s", key, exc)
+        return None
+    return None if raw is None else _json_loads(raw)
+
+
+# ── Stampede protection ───────────────────────────────────────────────────────
+# When a popular key is cold, concurrent requests would all fire the same
+# upstream call. The first thread in becomes the leader and fetches; the rest
+# wait on its Event and then read the freshly cached result. Outbound traffic
+# is bounded to one request per key, however many visitors arrive at once.
+_inflight: dict[str, threading.Event] = {}
+_inflight_lock = threading.Lock()
+# _INFLIGHT_WAIT (defined with the HTTP helpers, from the timeout and retry
+# budget) bounds how long followers wait for the leader.
+
+
+def _single_flight(cache: LRUCache, key: str, fetch, ttl: int = CACHE_NORMAL):
+    """Cache-through fetch(): one upstream call per key across all threads.
+    A fallback result is swapped for the last good payload when one exists."""
+    cached = _cache_get(cache, key)
+    if cached is not None:
+        return cached
+
+    with _inflight_lock:
+        event  = _inflight.get(key)
+        leader = event is None
+        if leader:
+            event = _inflight[key] = threading.Event()
+
+    if not leader:
+        event.wait(_INFLIGHT_WAIT)
+        cached = _cache_get(cache, key)
+        if cached is not None:
+            return cached
+        # Leader failed or timed out — fetch independently rather than error.
+        return fetch()
+
+    try:
+        # A previous leader may have finished between our miss and the claim.
+        result = _cache_get(cache, key)
+        if result is None:
+            result = fetch()
+            if _is_fallback(result):
+                stale = _stale_get(key)
+                if stale is not None:
+                    log.info("Upstream failed for %s — serving last good payload", key)
+                    result = stale
+                    ttl    = CACHE_SHORT
+            _cache_set(cache, key, result, ttl, stale=True)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        event.set()
+
 # ── API roots ─────────────────────────────────────────────────────────────────
 PUBCHEM_BASE = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
 CHEMBL_BASE  = "https://www.ebi.ac.uk/chembl/api/data"
@@ -58,10 +305,24 @@ CT_BASE      = "https://clinicaltrials.gov/api/v2"
 
 _CAS_RE = re.compile(r"^\d{2,7}-\d{2}-\d$")
 
+# PubChem name-lookup URL templates — fill with _encode_name(drug_name).
+_PUBCHEM_NAME_URL     = PUBCHEM_BASE + "/compound/name/{}"
+_PUBCHEM_PROPS_URL    = (_PUBCHEM_NAME_URL +
+    "/property/MolecularFormula,MolecularWeight,CanonicalSMILES,IUPACName/JSON")
+_PUBCHEM_PNG_URL      = _PUBCHEM_NAME_URL + "/PNG"
+_PUBCHEM_SYNONYMS_URL = _PUBCHEM_NAME_URL + "/synonyms/JSON"
+
+
+def _encode_name(name: str) -> str:
+    """URL path segment for a drug name. Plain ASCII alphanumerics — the common
+    case — need no escaping, so they skip quote()'s per-character walk. A '/'
+    is escaped too; left raw it would split the PubChem path."""
+    return name if name.isascii() and name.isalnum() else quote(name, safe="")
+
 # ── Reference fingerprint set ─────────────────────────────────────────────────
 # Known repurposed-drug scaffolds (PubChem canonical SMILES).
 # Tanimoto similarity vs this set is one scoring component.
-# RDKit parse failures are silently skipped in the loop.
+# Fingerprinted once at import (see REFERENCE_FPS); parse failures are dropped.
 _REFERENCE_SMILES = {
     "Aspirin":     "CC(=O)Oc1ccccc1C(=O)O",
     "Metformin":   "CN(C)C(=N)NC(N)=N",
@@ -134,76 +395,216 @@ _GENERIC_INTERACTIONS = [
 ]
 
 # ── HTTP helpers ──────────────────────────────────────────────────────────────
-def _get(url: str, params: dict | None = None,
-         timeout: int = 10, retries: int = 3, backoff: float = 1.0) -> tuple:
-    """GET with exponential back-off. Returns (json_or_None, is_fallback:bool)."""
-    for attempt in range(retries):
-        try:
-            r = requests.get(url, params=params, timeout=timeout)
-            if r.status_code == 200:
-                return r.json(), False
-            if r.status_code == 404:
-                return None, True          # not found — no point retrying
-        except requests.RequestException as exc:
-            log.warning("GET %s attempt %d/%d: %s", url, attempt + 1, retries, exc)
-        if attempt < retries - 1:
-            time.sleep(backoff * (2 ** attempt))
+# One pooled Session for every upstream host: keep-alive sockets amortise the
+# TCP + TLS handshake (~100-300 ms) across calls. Retries with exponential
+# back-off live in the adapter so they reuse the pooled connection too.
+# POST is retried as well — the only POST target is a read-only GraphQL query.
+# Retry-After is ignored: a throttled upstream answering "Retry-After: 3600"
+# would otherwise park the request (and the single-flight leader) for an hour.
+# Back-off alone keeps the worst case bounded — see _INFLIGHT_WAIT.
+_RETRY = Retry(
+    total=2, backoff_factor=0.2,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=None, raise_on_status=False,
+    respect_retry_after_header=False,
+)
+# Concurrent upstream fetches per worker. Under gevent the fetch pool's
+# "threads" are greenlets, so it is sized to the worker's connection budget
+# (gunicorn.conf.py passes worker_connections through) rather than to a thread
+# count; a small fixed pool would queue the third concurrent cold search.
+# The per-host socket pool is kept in step so no fetch waits on a connection.
+_FETCH_WORKERS = int(os.environ.get("WORKER_CONNECTIONS", 200)) if _GEVENT else 8
+
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip, deflate"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20, pool_maxsize=max(20, _FETCH_WORKERS), max_retries=_RETRY,
+))
+
+# (connect, read) — a dead host or stuck TLS handshake frees the greenlet after
+# 2 s; every upstream payload we request (<100 KB) arrives well inside 8 s.
+_TIMEOUT = (2, 8)
+
+# Followers in _single_flight wait this long for the leader before fetching
+# themselves, so it must outlast the slowest fetch: every attempt of every
+# sequential call in it (ChEMBL makes 3) running to the full timeout, plus the
+# back-off sleeps between attempts.
+_MAX_SEQUENTIAL_CALLS = 3
+_INFLIGHT_WAIT = _MAX_SEQUENTIAL_CALLS * (
+    sum(_TIMEOUT) * (_RETRY.total + 1)
+    + sum(_RETRY.backoff_factor * 2 ** i for i in range(_RETRY.total))
+) + 1
+
+
+def _fetch(url: str, params: dict | None = None, headers: dict | None = None,
+           timeout=_TIMEOUT):
+    """GET via the pooled session. Returns the Response, or None on transport error."""
+    try:
+        return SESSION.get(url, params=params, headers=headers, timeout=timeout)
+    except requests.RequestException as exc:
+        log.warning("GET %s failed: %s", url, exc)
+        return None
+
+
+def _decode(r, what: str):
+    """Decoded JSON body of r, or None if it is not valid JSON.
+
+    orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors, so
+    an HTML error page or truncated body becomes a fallback with either parser.
+    """
+    try:
+        return _json_loads(r.content)
+    except ValueError as exc:
+        log.warning("%s -> bad JSON: %s", what, exc)
+        return None
+
+
+def _get(url: str, params: dict | None = None, timeout=_TIMEOUT) -> tuple:
+    """GET via the pooled session. Returns (json_or_None, is_fallback:bool)."""
+    r = _fetch(url, params=params, timeout=timeout)
+    if r is None:
+        return None, True
+    if r.status_code == 200:
+        data = _decode(r, f"GET {url}")
+        return data, data is None
+    if r.status_code != 404:
+        log.warning("GET %s -> HTTP %d", url, r.status_code)
     return None, True
 
 
-def _post_gql(query: str, variables: dict,
-              timeout: int = 10, retries: int = 3, backoff: float = 1.0) -> tuple:
-    """POST to Open Targets GraphQL with retry."""
-    for attempt in range(retries):
-        try:
-            r = requests.post(
-                OT_GRAPHQL,
-                json={"query": query, "variables": variables},
-                timeout=timeout,
-            )
-            if r.status_code == 200:
-                return r.json(), False
-        except requests.RequestException as exc:
-            log.warning("GraphQL attempt %d/%d: %s", attempt + 1, retries, exc)
-        if attempt < retries - 1:
-            time.sleep(backoff * (2 ** attempt))
+# Validators from the last 200 per cache key: (etag, last_modified, parsed_result).
+# Once the result itself has been evicted from its LRU (or expired in Redis), the
+# refetch is sent as a conditional GET and a 304 revives the parsed result with
+# no body transfer and no re-parse. Results are shared references with the main
+# caches, so this costs little beyond the two header strings.
+_revalidate_cache = LRUCache(maxsize=384)
+# With Redis, the same (etag, last_modified, result) triple is also kept there
+# without TTL, so a fresh worker (or one whose LRU dropped the entry) can still
+# revalidate a week-old PubChem record with a 304 instead of a full download
+# and re-parse. The body travels with its validators: it is exactly the one
+# the ETag was issued for, whatever else has since been cached under the key.
+_VALIDATOR_PREFIX = _REDIS_PREFIX + "etag:"
+
+
+def _validators_get(key: str):
+    """(etag, last_modified, result) persisted in Redis for key, or None."""
+    if _redis is None:
+        return None
+    try:
+        raw = _redis.get(_VALIDATOR_PREFIX + key)
+    except redis.RedisError as exc:
+        log.warning("Redis GET validators %s: %s", key, exc)
+        return None
+    return None if raw is None else tuple(_json_loads(raw))
+
+
+def _validators_set(key: str, etag, last_modified, result) -> None:
+    if _redis is None:
+        return
+    try:
+        _redis.set(_VALIDATOR_PREFIX + key,
+                   _json_dumps([etag, last_modified, result]))
+    except redis.RedisError as exc:
+        log.warning("Redis SET validators %s: %s", key, exc)
+
+
+def _get_revalidated(url: str, key: str, parse, params: dict | None = None,
+                     timeout=_TIMEOUT):
+    """Conditional GET. Returns parse(json), the revalidated prior result, or None."""
+    with _lock:
+        prior = _revalidate_cache.get(key)
+    if prior is None:
+        prior = _validators_get(key)
+        if prior is not None:
+            with _lock:
+                _revalidate_cache[key] = prior
+    headers = {}
+    if prior is not None:
+        etag, last_modified, _ = prior
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    r = _fetch(url, params=params, headers=headers, timeout=timeout)
+    if r is None:
+        return None
+    if r.status_code == 304 and prior is not None:
+        return prior[2]
+    if r.status_code != 200:
+        if r.status_code != 404:
+            log.warning("GET %s -> HTTP %d", url, r.status_code)
+        return None
+
+    data = _decode(r, f"GET {url}")
+    if data is None:
+        return None
+    try:
+        result    = parse(data)
+    except ValueError as exc:
+        log.warning("GET %s -> unparseable body: %s", url, exc)
+        return None
+    etag          = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _lock:
+            _revalidate_cache[key] = (etag, last_modified, result)
+        _validators_set(key, etag, last_modified, result)
+    return result
+
+
+def _post_gql(query: str, variables: dict, timeout=_TIMEOUT) -> tuple:
+    """POST to Open Targets GraphQL via the pooled session."""
+    try:
+        r = SESSION.post(
+            OT_GRAPHQL,
+            json={"query": query, "variables": variables},
+            timeout=timeout,
+        )
+        if r.status_code == 200:
+            data = _decode(r, "GraphQL")
+            return data, data is None
+        log.warning("GraphQL -> HTTP %d", r.status_code)
+    except requests.RequestException as exc:
+        log.warning("GraphQL failed: %s", exc)
     return None, True
 
 # ── PubChem ───────────────────────────────────────────────────────────────────
-def search_pubchem(drug_name: str) -> dict:
-    key = f"pc:{drug_name.lower()}"
-    with _lock:
-        cached = _pubchem_cache.get(key)
-    if cached is not None:
-        return cached
+_PUBCHEM_FALLBACK = {
+    "molecular_formula": "N/A",
+    "molecular_weight":  "N/A",
+    "canonical_smiles":  "",
+    "iupac_name":        "N/A",
+    "source":            "fallback",
+}
 
-    url = (
-        f"{PUBCHEM_BASE}/compound/name/{quote(drug_name)}"
-        "/property/MolecularFormula,MolecularWeight,CanonicalSMILES,IUPACName/JSON"
-    )
-    data, _ = _get(url)
-    if data:
-        p = data.get("PropertyTable", {}).get("Properties", [{}])[0]
-        result = {
-            "molecular_formula": p.get("MolecularFormula", "N/A"),
-            "molecular_weight":  str(p.get("MolecularWeight", "N/A")),
-            "canonical_smiles":  p.get("CanonicalSMILES", ""),
-            "iupac_name":        p.get("IUPACName", "N/A"),
-            "image_url":         f"{PUBCHEM_BASE}/compound/name/{quote(drug_name)}/PNG",
-            "source":            "pubchem",
-        }
-    else:
-        result = {
-            "molecular_formula": "N/A",
-            "molecular_weight":  "N/A",
-            "canonical_smiles":  "",
-            "iupac_name":        "N/A",
-            "image_url":         f"{PUBCHEM_BASE}/compound/name/{quote(drug_name)}/PNG",
-            "source":            "fallback",
-        }
 
-    with _lock:
-        _pubchem_cache[key] = result
+def _parse_pubchem(data: dict, image_url: str) -> dict:
+    p = data.get("PropertyTable", {}).get("Properties", [{}])[0]
+    return {
+        "molecular_formula": p.get("MolecularFormula", "N/A"),
+        "molecular_weight":  str(p.get("MolecularWeight", "N/A")),
+        "canonical_smiles":  p.get("CanonicalSMILES", ""),
+        "iupac_name":        p.get("IUPACName", "N/A"),
+        "image_url":         image_url,
+        "source":            "pubchem",
+    }
+
+
+def search_pubchem(drug_name: str) -> dict:
+    key = f"pc:{_canon_name(drug_name)}"
+    return _single_flight(_pubchem_cache, key, lambda: _fetch_pubchem(drug_name, key),
+                          CACHE_LONG)
+
+
+def _fetch_pubchem(drug_name: str, key: str) -> dict:
+    # Encode once — the property URL, image URL and fallback all share it.
+    encoded   = _encode_name(drug_name)
+    image_url = _PUBCHEM_PNG_URL.format(encoded)
+    result = _get_revalidated(_PUBCHEM_PROPS_URL.format(encoded), key,
+                              lambda d: _parse_pubchem(d, image_url))
+    if result is None:
+        result = {**_PUBCHEM_FALLBACK, "image_url": image_url}
     return result
 
 # ── ChEMBL ────────────────────────────────────────────────────────────────────
@@ -214,18 +615,15 @@ _CHEMBL_FALLBACK = {
 }
 
 def get_chembl_data(drug_name: str) -> dict:
-    key = f"chembl:{drug_name.lower()}"
-    with _lock:
-        cached = _chembl_cache.get(key)
-    if cached is not None:
-        return cached
+    key = f"chembl:{_canon_name(drug_name)}"
+    return _single_flight(_chembl_cache, key, lambda: _fetch_chembl(drug_name), CACHE_LONG)
+
 
+def _fetch_chembl(drug_name: str) -> dict:
     mol_data, _ = _get(f"{CHEMBL_BASE}/molecule", params={
         "pref_name__iexact": drug_name, "format": "json", "limit": 1,
     })
     if not mol_data or not mol_data.get("molecules"):
-        with _lock:
-            _chembl_cache[key] = _CHEMBL_FALLBACK
         return _CHEMBL_FALLBACK
 
     m0        = mol_data["molecules"][0]
@@ -262,7 +660,7 @@ def get_chembl_data(drug_name: str) -> dict:
             except (ValueError, TypeError):
                 pass
 
-    result = {
+    return {
         "chembl_id":          chembl_id,
         "max_phase":          max_phase,
         "mechanisms":         mechanisms[:5],
@@ -271,9 +669,6 @@ def get_chembl_data(drug_name: str) -> dict:
         "high_potency_count": high_potency,
         "source":             "chembl",
     }
-    with _lock:
-        _chembl_cache[key] = result
-    return result
 
 # ── Open Targets ──────────────────────────────────────────────────────────────
 _OT_QUERY = """
@@ -302,72 +697,101 @@ def get_ot_data(chembl_id: str | None) -> dict:
     if not chembl_id:
         return _OT_FALLBACK
 
-    key = f"ot:{chembl_id}"
-    with _lock:
-        cached = _ot_cache.get(key)
-    if cached is not None:
-        return cached
+    return _single_flight(_ot_cache, f"ot:{chembl_id}", lambda: _fetch_ot(chembl_id))
 
-    data, _ = _post_gql(_OT_QUERY, {"chemblId": chembl_id})
-    if data and data.get("data", {}).get("drug"):
-        d    = data["data"]["drug"]
-        rows = d.get("indications", {}).get("rows", [])
-        result = {
-            "indication_count": d.get("indicationsCount") or len(rows),
-            "linked_targets":   (d.get("linkedTargets") or {}).get("count", 0),
-            "max_phase_ot":     d.get("maximumClinicalTrialPhase") or 0,
-            "indications":      [
-                {"disease": r["disease"]["name"],
-                 "phase":   r.get("maxPhaseForIndication", 0)}
-                for r in rows[:5]
-            ],
-            "source": "open_targets",
-        }
-    else:
-        result = dict(_OT_FALLBACK)
 
-    with _lock:
-        _ot_cache[key] = result
-    return result
+def _fetch_ot(chembl_id: str) -> dict:
+    data, _ = _post_gql(_OT_QUERY, {"chemblId": chembl_id})
+    if not data or not data.get("data", {}).get("drug"):
+        return _OT_FALLBACK
+    d    = data["data"]["drug"]
+    rows = d.get("indications", {}).get("rows", [])
+    return {
+        "indication_count": d.get("indicationsCount") or len(rows),
+        "linked_targets":   (d.get("linkedTargets") or {}).get("count", 0),
+        "max_phase_ot":     d.get("maximumClinicalTrialPhase") or 0,
+        "indications":      [
+            {"disease": r["disease"]["name"],
+             "phase":   r.get("maxPhaseForIndication", 0)}
+            for r in rows[:5]
+        ],
+        "source": "open_targets",
+    }
 
 # ── Tanimoto (RDKit) ──────────────────────────────────────────────────────────
 # IMPORTANT: Mol objects are NOT stored in any cache.
 # Only primitive scores (float) are cached. This keeps memory predictable.
 
+# ECFP4 (radius 2) folded to 2048 bits. Built once: the generator owns the
+# atom-invariant and bit-folding setup, and the legacy per-call
+# GetMorganFingerprintAsBitVect API is deprecated (logs a warning per call).
+_MORGAN_GEN = (
+    rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=2048)
+    if RDKIT_AVAILABLE else None
+)
+
+
 def _fp(smiles: str):
-    """Morgan FP as bit vector, or None on any failure."""
+    """Morgan FP as ExplicitBitVect (popcount Tanimoto), or None on any failure."""
     if not RDKIT_AVAILABLE or not smiles:
         return None
     try:
         mol = Chem.MolFromSmiles(smiles)
         if mol is None:
             return None
-        return rdMolDescriptors.GetMorganFingerprintAsBitVect(mol, radius=2, nBits=2048)
+        return _MORGAN_GEN.GetFingerprint(mol)
     except Exception:
         return None
 
 
-def tanimoto_vs_references(query_smiles: str) -> float:
-    """Max Tanimoto similarity of query against the known-repurposing reference set."""
-    fp_q = _fp(query_smiles)
-    if fp_q is None:
+# Reference-panel fingerprints are built once at import — ~256 B each, so
+# holding them is cheap, and the hot path then only parses the query SMILES.
+# Unparseable references are dropped here rather than skipped per call.
+REFERENCE_FPS: dict = {}
+if RDKIT_AVAILABLE:
+    for _name, _smi in _REFERENCE_SMILES.items():
+        _ref_fp = _fp(_smi)
+        if _ref_fp is not None:
+            REFERENCE_FPS[_name] = _ref_fp
+        else:
+            log.warning("Reference SMILES for %s failed to parse", _name)
+
+# Contiguous list for BulkTanimotoSimilarity. Mixed widths would raise
+# "BitVects must be same length" at query time, so fail at import instead.
+_REFERENCE_FP_LIST = list(REFERENCE_FPS.values())
+if any(fp.GetNumBits() != 2048 for fp in _REFERENCE_FP_LIST):
+    raise RuntimeError("Reference fingerprints must all be 2048 bits wide")
+
+
+# Similarity results are memoised on canonical SMILES, not drug name, so
+# synonyms / brand names / differently-written SMILES for the same molecule
+# share one entry. Only str → float pairs are held — a few hundred KB at most.
+@functools.lru_cache(maxsize=4096)
+def _canon_smiles(smiles: str) -> str:
+    """RDKit canonical SMILES; the input unchanged if RDKit is absent or parsing fails."""
+    if not RDKIT_AVAILABLE or not smiles:
+        return smiles
+    try:
+        return Chem.CanonSmiles(smiles)
+    except Exception:
+        return smiles
+
+
+@functools.lru_cache(maxsize=4096)
+def _tanimoto_vs_references_canon(canon: str) -> float:
+    fp_q = _fp(canon)
+    if fp_q is None or not _REFERENCE_FP_LIST:
+        return 0.0
+    try:
+        # One C++ call over the whole panel instead of a Python loop per pair.
+        return float(max(DataStructs.BulkTanimotoSimilarity(fp_q, _REFERENCE_FP_LIST)))
+    except Exception:
         return 0.0
-    best = 0.0
-    for smi in _REFERENCE_SMILES.values():
-        fp_r = _fp(smi)
-        if fp_r is None:
-            continue
-        try:
-            sim = DataStructs.TanimotoSimilarity(fp_q, fp_r)
-            if sim > best:
-                best = sim
-        except Exception:
-            continue
-    return float(best)
 
 
-def tanimoto_pairwise(smi1: str, smi2: str) -> float:
-    fp1, fp2 = _fp(smi1), _fp(smi2)
+@functools.lru_cache(maxsize=4096)
+def _tanimoto_pairwise_canon(canon1: str, canon2: str) -> float:
+    fp1, fp2 = _fp(canon1), _fp(canon2)
     if fp1 is None or fp2 is None:
         return 0.0
     try:
@@ -375,8 +799,21 @@ def tanimoto_pairwise(smi1: str, smi2: str) -> float:
     except Exception:
         return 0.0
 
+
+def tanimoto_vs_references(query_smiles: str) -> float:
+    """Max Tanimoto similarity of query against the known-repurposing reference set."""
+    return _tanimoto_vs_references_canon(_canon_smiles(query_smiles))
+
+
+def tanimoto_pairwise(smi1: str, smi2: str) -> float:
+    # Symmetric — order the key so (a, b) and (b, a) share a cache entry.
+    c1, c2 = sorted((_canon_smiles(smi1), _canon_smiles(smi2)))
+    return _tanimoto_pairwise_canon(c1, c2)
+
 # ── Confidence Score ──────────────────────────────────────────────────────────
-def calculate_confidence_score(drug_name: str, indication: str = "repurposing") -> dict:
+def calculate_confidence_score(drug_name: str, indication: str = "repurposing", *,
+                               mol: dict | None = None, chembl: dict | None = None,
+                               ot: dict | None = None) -> dict:
     """
     Scientifically grounded heuristic (no heavy ML — safe on 512 MB).
 
@@ -389,16 +826,20 @@ def calculate_confidence_score(drug_name: str, indication: str = "repurposing")
     ot_breadth         0.10    Open Targets indication count (existing evidence)
 
     All sub-scores are bounded [0, 1] before weighting.
+    Callers that already hold mol / chembl / ot payloads may pass them in to
+    skip the redundant lookups.
     """
-    cache_key = f"score:{drug_name.lower()}:{indication.lower()[:20]}"
-    with _lock:
-        cached = _score_cache.get(cache_key)
+    cache_key = f"score:{_canon_name(drug_name)}:{_canon_name(indication)[:20]}"
+    cached = _cache_get(_score_cache, cache_key)
     if cached is not None:
         return cached
 
-    mol    = search_pubchem(drug_name)
-    chembl = get_chembl_data(drug_name)
-    ot     = get_ot_data(chembl.get("chembl_id"))
+    if mol is None:
+        mol = search_pubchem(drug_name)
+    if chembl is None:
+        chembl = get_chembl_data(drug_name)
+    if ot is None:
+        ot = get_ot_data(chembl.get("chembl_id"))
 
     # 1. Phase score — normalise to [0, 1] over max clinical phase 0-4
     raw_phase   = max(int(chembl.get("max_phase", 0)),
@@ -445,96 +886,183 @@ def calculate_confidence_score(drug_name: str, indication: str = "repurposing")
             "ot_score":       round(ot_score, 3),
         },
         "raw_phase": raw_phase,
+        # Cached alongside the score, so it reports the age of the data the
+        # score was built from — not the time of the request serving it.
+        "generated_at": time.time(),
         "chembl_id": chembl.get("chembl_id"),
         "source":    src,
     }
-    with _lock:
-        _score_cache[cache_key] = result
+    _cache_set(_score_cache, cache_key, result)
     return result
 
 # ── Clinical Trials ───────────────────────────────────────────────────────────
+_CT_FALLBACK = {"count": 0, "trials": [], "source": "fallback"}
+
+
+# Shared read-only defaults for absent JSON sections — `x.get(k) or _EMPTY`
+# avoids allocating a throwaway {} / ["N/A"] on every miss in the study loop.
+_EMPTY: dict = {}
+_NO_PHASES   = ("N/A",)
+
+
+# Only IDs of this exact shape reach the page; results.html renders them |safe.
+_NCT_ID_RE = re.compile(r"NCT\d{8}")
+
+
+def _parse_trials(data: dict) -> dict:
+    trials = []
+    for s in data.get("studies") or ():
+        proto  = s.get("protocolSection") or _EMPTY
+        ident  = proto.get("identificationModule") or _EMPTY
+        nct_id = ident.get("nctId")
+        status = proto.get("statusModule") or _EMPTY
+        spon   = proto.get("sponsorCollaboratorsModule") or _EMPTY
+        design = proto.get("designModule") or _EMPTY
+        trials.append({
+            "nct_id":          nct_id if _NCT_ID_RE.fullmatch(nct_id or "") else "N/A",
+            "title":           ident.get("briefTitle", "N/A"),
+            "phase":           ", ".join(design.get("phases") or _NO_PHASES),
+            "status":          status.get("overallStatus", "N/A"),
+            "start_date":      (status.get("startDateStruct") or _EMPTY).get("date", "N/A"),
+            "completion_date": (status.get("completionDateStruct") or _EMPTY).get("date", "N/A"),
+            "sponsor":         (spon.get("leadSponsor") or _EMPTY).get("name", "N/A"),
+        })
+    return {"count": len(trials), "trials": trials, "source": "clinicaltrials"}
+
+
+# Only the modules _parse_trials reads; the full study record is ~10x larger.
+# The batch query also needs interventions to route studies back to drugs.
+_CT_FIELDS = ",".join((
+    "protocolSection.identificationModule",
+    "protocolSection.statusModule",
+    "protocolSection.designModule.phases",
+    "protocolSection.sponsorCollaboratorsModule.leadSponsor",
+))
+_CT_BATCH_FIELDS = _CT_FIELDS + ",protocolSection.armsInterventionsModule.interventions"
+
+
 def search_clinical_trials(drug_name: str) -> dict:
-    key = f"ct:{drug_name.lower()}"
-    with _lock:
-        cached = _ct_cache.get(key)
-    if cached is not None:
-        return cached
+    key = f"ct:{_canon_name(drug_name)}"
+    return _single_flight(_ct_cache, key, lambda: _fetch_trials(drug_name, key))
 
-    data, _ = _get(CT_BASE + "/studies", params={
+
+def _fetch_trials(drug_name: str, key: str) -> dict:
+    result = _get_revalidated(CT_BASE + "/studies", key, _parse_trials, params={
         "query.term": drug_name, "pageSize": 5, "sort": "Relevance",
+        "fields":     _CT_FIELDS,
     })
-    if data:
-        trials = []
-        for s in data.get("studies", []):
-            proto  = s.get("protocolSection", {})
-            ident  = proto.get("identificationModule", {})
-            status = proto.get("statusModule", {})
-            spon   = proto.get("sponsorCollaboratorsModule", {})
-            phases = proto.get("designModule", {}).get("phases") or ["N/A"]
-            trials.append({
-                "nct_id":          ident.get("nctId", "N/A"),
-                "title":           ident.get("briefTitle", "N/A"),
-                "phase":           ", ".join(phases),
-                "status":          status.get("overallStatus", "N/A"),
-                "start_date":      (status.get("startDateStruct") or {}).get("date", "N/A"),
-                "completion_date": (status.get("completionDateStruct") or {}).get("date", "N/A"),
-                "sponsor":         (spon.get("leadSponsor") or {}).get("name", "N/A"),
-            })
-        result = {"count": len(trials), "trials": trials, "source": "clinicaltrials"}
-    else:
-        result = {"count": 0, "trials": [], "source": "fallback"}
+    return _CT_FALLBACK if result is None else result
 
-    with _lock:
-        _ct_cache[key] = result
-    return result
+
+def _intervention_text(study: dict) -> str:
+    proto = study.get("protocolSection") or _EMPTY
+    arms  = proto.get("armsInterventionsModule") or _EMPTY
+    parts = [(proto.get("identificationModule") or _EMPTY).get("briefTitle", "")]
+    for iv in arms.get("interventions") or ():
+        parts.append(iv.get("name", ""))
+        parts.extend(iv.get("otherNames") or ())
+    return _canon_name(" ".join(parts))
+
+
+def search_clinical_trials_batch(drug_names: list[str]) -> dict[str, dict]:
+    """
+    Trials for several drugs in one ClinicalTrials.gov request.
+
+    Uncached names are OR-ed into a single query.term; studies are routed back
+    to each drug by matching its name as a whole word (so "met" does not claim
+    metformin trials, nor "aspirin" an "aspirin-free" arm) against the
+    interventions / title. A
+    drug whose slice reached the full 5 studies is cached exactly as
+    search_clinical_trials would; a shorter slice may just mean other drugs
+    crowded it off the relevance-sorted page, so that drug falls through to the
+    single-drug path, fetched concurrently.
+    """
+    results: dict[str, dict] = {}       # canonical name → trials
+    pending: dict[str, str]  = {}       # canonical name → name as given
+    for name in drug_names:
+        canon = _canon_name(name)
+        if canon in results or canon in pending:
+            continue
+        hit = _cache_get(_ct_cache, f"ct:{canon}")
+        if hit is not None:
+            results[canon] = hit
+        else:
+            pending[canon] = name
+
+    if len(pending) > 1:
+        data, _ = _get(CT_BASE + "/studies", params={
+            "query.term": " OR ".join(f"({n})" for n in pending.values()),
+            "pageSize":   5 * len(pending),
+            "sort":       "Relevance",
+            "fields":     _CT_BATCH_FIELDS,
+        })
+        buckets: dict[str, list] = {canon: [] for canon in pending}
+        patterns = {canon: re.compile(rf"(?<![\w-]){re.escape(canon)}(?![\w-])")
+                    for canon in pending}
+        for study in (data or _EMPTY).get("studies") or ():
+            text = _intervention_text(study)
+            for canon, hits in buckets.items():
+                if len(hits) < 5 and patterns[canon].search(text):
+                    hits.append(study)
+        for canon, studies in buckets.items():
+            if len(studies) == 5:
+                result = _parse_trials({"studies": studies})
+                # Same key search_clinical_trials single-flights on, so it
+                # needs the same last-good copy for outages.
+                _cache_set(_ct_cache, f"ct:{canon}", result, stale=True)
+                results[canon] = result
+                del pending[canon]
+
+    # Leftovers go out concurrently, so the batch never costs more than one
+    # extra round-trip over the plain fan-out.
+    futures = {canon: _submit_trials(name) for canon, name in pending.items()}
+    for canon, f in futures.items():
+        results[canon] = f.result()
+    return {name: results[_canon_name(name)] for name in drug_names}
 
 # ── Drug Interactions ─────────────────────────────────────────────────────────
-def search_drug_interactions(drug_name: str) -> dict:
-    key = f"inter:{drug_name.lower()}"
-    with _lock:
-        cached = _interact_cache.get(key)
-    if cached is not None:
-        return cached
+# Static data, so every possible payload is built once at import. A lookup is a
+# single dict probe — cheaper than the LRU / Redis round-trip it used to take.
+# Every caller shares these objects, so they are frozen all the way down:
+# read-only mappings holding tuples of read-only rows.
+def _frozen_result(rows: list[dict], source: str) -> MappingProxyType:
+    return MappingProxyType({
+        "interactions": tuple(MappingProxyType(r) for r in rows),
+        "source":       source,
+    })
+
+
+_INTERACTION_RESULTS = MappingProxyType({
+    name: _frozen_result(rows, "curated") for name, rows in _INTERACTIONS.items()
+})
+_GENERIC_INTERACTION_RESULT = _frozen_result(_GENERIC_INTERACTIONS, "fallback")
 
-    curated = _INTERACTIONS.get(drug_name.lower())
-    result = {
-        "interactions": curated if curated else _GENERIC_INTERACTIONS,
-        "source":       "curated" if curated else "fallback",
-    }
-    with _lock:
-        _interact_cache[key] = result
-    return result
+
+def search_drug_interactions(drug_name: str) -> MappingProxyType:
+    return _INTERACTION_RESULTS.get(_canon_name(drug_name), _GENERIC_INTERACTION_RESULT)
 
 # ── CAS number (best-effort via PubChem synonyms) ─────────────────────────────
+# Cached as {"cas", "source"} so a failed lookup is a fallback (SHORT TTL, the
+# last good CAS served instead) rather than an "N/A" pinned for a week.
+_CAS_FALLBACK = {"cas": "N/A", "source": "fallback"}
+
+
 def get_cas_number(drug_name: str) -> str:
-    key = f"cas:{drug_name.lower()}"
-    with _lock:
-        cached = _cas_cache.get(key)
-    if cached is not None:
-        return cached
+    key = f"cas:{_canon_name(drug_name)}"
+    return _single_flight(_cas_cache, key, lambda: _fetch_cas(drug_name),
+                          CACHE_LONG)["cas"]
 
-    cas = "N/A"
-    try:
-        data, _ = _get(
-            f"{PUBCHEM_BASE}/compound/name/{quote(drug_name)}/synonyms/JSON",
-            timeout=8, retries=2,
-        )
-        if data:
-            syns = (
-                data.get("InformationList", {})
-                    .get("Information", [{}])[0]
-                    .get("Synonym", [])
-            )
-            for s in syns:
-                if _CAS_RE.match(s):
-                    cas = s
-                    break
-    except Exception:
-        pass
 
-    with _lock:
-        _cas_cache[key] = cas
-    return cas
+def _fetch_cas(drug_name: str) -> dict:
+    data, _ = _get(_PUBCHEM_SYNONYMS_URL.format(_encode_name(drug_name)))
+    if data is None:
+        return _CAS_FALLBACK
+    try:
+        syns = data["InformationList"]["Information"][0].get("Synonym") or ()
+    except (KeyError, IndexError, TypeError):
+        return _CAS_FALLBACK
+    cas = next((s for s in syns if _CAS_RE.match(s)), "N/A")
+    return {"cas": cas, "source": "pubchem"}
 
 # ── Phase label ───────────────────────────────────────────────────────────────
 def _phase_label(phase) -> str:
@@ -546,14 +1074,82 @@ def _phase_label(phase) -> str:
         4: "Approved / Phase IV",
     }.get(int(phase or 0), "Unknown")
 
+# ── Upstream fan-out ──────────────────────────────────────────────────────────
+# All upstream calls are I/O-bound, so threads overlap the PubChem / ChEMBL /
+# ClinicalTrials round-trips and wall-clock drops to max(RTT) instead of sum(RTT).
+# Pool tasks are leaf fetchers only — they never submit back into the pool,
+# so the executor cannot deadlock on itself.
+_executor = ThreadPoolExecutor(max_workers=_FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+def _chembl_and_ot(drug_name: str) -> tuple[dict, dict]:
+    """ChEMBL then Open Targets — OT is keyed on the ChEMBL ID, so chain them."""
+    chembl = get_chembl_data(drug_name)
+    return chembl, get_ot_data(chembl.get("chembl_id"))
+
+
+def _resolved(value) -> Future:
+    f = Future()
+    f.set_result(value)
+    return f
+
+
+def _l1_peek(cache: LRUCache, key: str):
+    with _lock:
+        value = cache.get(key)
+        return _short_cache.get(key) if value is None else value
+
+
+# Warm keys resolve in the calling thread and never touch the pool — a fully
+# cached profile costs no thread hand-offs at all. Only L1 is peeked here;
+# Redis / upstream misses go to the pool where their I/O can overlap.
+def _submit_pubchem(drug_name: str) -> Future:
+    hit = _l1_peek(_pubchem_cache, f"pc:{_canon_name(drug_name)}")
+    return _resolved(hit) if hit is not None else _executor.submit(search_pubchem, drug_name)
+
+
+def _submit_trials(drug_name: str) -> Future:
+    hit = _l1_peek(_ct_cache, f"ct:{_canon_name(drug_name)}")
+    return _resolved(hit) if hit is not None else _executor.submit(search_clinical_trials, drug_name)
+
+
+def _submit_chembl_and_ot(drug_name: str) -> Future:
+    chembl = _l1_peek(_chembl_cache, f"chembl:{_canon_name(drug_name)}")
+    if chembl is not None:
+        chembl_id = chembl.get("chembl_id")
+        ot = _l1_peek(_ot_cache, f"ot:{chembl_id}") if chembl_id else _OT_FALLBACK
+        if ot is not None:
+            return _resolved((chembl, ot))
+    return _executor.submit(_chembl_and_ot, drug_name)
+
+
+def _submit_cas(drug_name: str) -> Future:
+    hit = _l1_peek(_cas_cache, f"cas:{_canon_name(drug_name)}")
+    return _resolved(hit["cas"]) if hit is not None else _executor.submit(get_cas_number, drug_name)
+
+
+def prefetch_drugs(drug_names: list[str], with_cas: bool = False) -> None:
+    """Populate the leaf caches for every drug concurrently."""
+    futures = []
+    for name in drug_names:
+        futures.append(_submit_pubchem(name))
+        futures.append(_submit_trials(name))
+        futures.append(_submit_chembl_and_ot(name))
+        if with_cas:
+            futures.append(_submit_cas(name))
+    for f in futures:
+        f.result()
+
 # ── Full drug profile ─────────────────────────────────────────────────────────
 def build_drug_profile(drug_name: str) -> dict:
-    mol    = search_pubchem(drug_name)
-    chembl = get_chembl_data(drug_name)
-    ct     = search_clinical_trials(drug_name)
-    inter  = search_drug_interactions(drug_name)
-    conf   = calculate_confidence_score(drug_name)
-    ot     = get_ot_data(chembl.get("chembl_id"))
+    f_mol  = _submit_pubchem(drug_name)
+    f_ct   = _submit_trials(drug_name)
+    f_ot   = _submit_chembl_and_ot(drug_name)
+    inter  = search_drug_interactions(drug_name)      # local lookup, no I/O
+    mol    = f_mol.result()
+    ct     = f_ct.result()
+    chembl, ot = f_ot.result()
+    conf   = calculate_confidence_score(drug_name, mol=mol, chembl=chembl, ot=ot)
 
     ot_ind     = [i["disease"] for i in ot.get("indications", [])]
     indication = ", ".join(ot_ind[:3]) if ot_ind else "New therapeutic use"
@@ -575,6 +1171,7 @@ def build_drug_profile(drug_name: str) -> dict:
         "max_phase":        chembl.get("max_phase", 0),
         "target_count":     chembl.get("target_count", 0),
         "source":           conf.get("source", "live"),
+        "generated_at":     conf["generated_at"],
     }
 
 # ── Compare profile (matches code.html column schema) ────────────────────────
@@ -615,6 +1212,7 @@ def build_compare_profile(drug_name: str) -> dict:
         "target_count": p["target_count"],
         "chembl_id":    p["chembl_id"],
         "source":       p["source"],
+        "generated_at": p["generated_at"],
     }
 
 # ── Mechanistic overlap (compare endpoint analysis block) ────────────────────
@@ -647,17 +1245,16 @@ def compute_mechanistic_overlap(profiles: list) -> dict:
         if matrix[i][j] > 0.4
     ]
 
+    # Lower-cased names and interaction text built once per drug, not per pair.
+    names_lc   = [p["name"].lower() for p in profiles]
+    inter_text = [
+        " ".join(x["drug"].lower() for x in p["interactions"]["all"])
+        for p in profiles
+    ]
     contra_flags = []
     for i in range(n):
         for j in range(i + 1, n):
-            drugs_in_j_inter = " ".join(
-                x["drug"].lower() for x in profiles[j]["interactions"]["all"]
-            )
-            drugs_in_i_inter = " ".join(
-                x["drug"].lower() for x in profiles[i]["interactions"]["all"]
-            )
-            if (profiles[i]["name"].lower() in drugs_in_j_inter or
-                    profiles[j]["name"].lower() in drugs_in_i_inter):
+            if names_lc[i] in inter_text[j] or names_lc[j] in inter_text[i]:
                 contra_flags.append({
                     "pair":     [profiles[i]["name"], profiles[j]["name"]],
                     "risk":     "Co-administration interaction flagged in curated database",
@@ -681,6 +1278,26 @@ def compute_mechanistic_overlap(profiles: list) -> dict:
         "source":                  "live",
     }
 
+# ── Timestamps ────────────────────────────────────────────────────────────────
+# Page footers only show second resolution, so format once per second and
+# reuse the string. A single tuple swap keeps readers consistent without a lock.
+_ts_cache: tuple[int, str] = (0, "")
+
+
+def now_str() -> str:
+    """Local time as 'YYYY-MM-DD HH:MM:SS', re-formatted at most once per second."""
+    global _ts_cache
+    t = int(time.time())
+    cached = _ts_cache
+    if cached[0] != t:
+        cached = _ts_cache = (t, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)))
+    return cached[1]
+
+
+def fmt_ts(ts: float) -> str:
+    """Epoch seconds as local 'YYYY-MM-DD HH:MM:SS'."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
 # ── Routes ────────────────────────────────────────────────────────────────────
 @app.route("/")
 def index():
@@ -693,18 +1310,43 @@ def search():
     if not query:
         return render_template("results.html", drugs=[], query="", cache_info=None)
     profile    = build_drug_profile(query)
-    cache_info = {"last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    cache_info = {"last_updated": fmt_ts(profile["generated_at"])}
     return render_template("results.html", drugs=[profile], query=query, cache_info=cache_info)
 
 
+# Typeahead clients hit /api/search on every keystroke; one- and two-letter
+# prefixes never name a drug, so answer them without touching any upstream.
+_MIN_QUERY_LEN = 3
+
+
 @app.route("/api/search", methods=["GET"])
 def api_search():
     query = request.args.get("q", "").strip()
-    if not query:
+    if len(query) < _MIN_QUERY_LEN:
         return jsonify([])
     return jsonify([build_drug_profile(query)])
 
 
+@app.route("/api/search_multi", methods=["GET"])
+def api_search_multi():
+    """
+    GET /api/search_multi?drugs=Metformin,Aspirin,Sildenafil
+
+    Full profiles for up to 3 drugs; their trials come from one batched
+    ClinicalTrials.gov request.
+    """
+    raw   = request.args.get("drugs", "")
+    names = [n.strip() for n in raw.split(",") if n.strip()][:3]
+    if not names:
+        return jsonify({"error": "Provide ?drugs=DrugA,DrugB", "source": "error"}), 400
+    names = [n for n in names if len(n) >= _MIN_QUERY_LEN]
+    if not names:
+        return jsonify([])
+    search_clinical_trials_batch(names)
+    prefetch_drugs(names)
+    return jsonify([build_drug_profile(n) for n in names])
+
+
 @app.route("/api/compare", methods=["GET"])
 def api_compare():
     """
@@ -720,6 +1362,7 @@ def api_compare():
     if not names:
         return jsonify({"error": "Provide ?drugs=DrugA,DrugB", "source": "error"}), 400
 
+    prefetch_drugs(names, with_cas=True)
     profiles = [build_compare_profile(n) for n in names]
     overlap  = compute_mechanistic_overlap(profiles)
     all_live = all(p["source"] not in ("fallback",) for p in profiles)
@@ -744,9 +1387,14 @@ def compare():
             drug_names.append(n)
             i += 1
         drug_names     = drug_names[:3]
+        prefetch_drugs(drug_names, with_cas=True)
         drug_data_list = [build_compare_profile(n) for n in drug_names]
 
-    cache_info = {"last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    # Oldest underlying data among the compared drugs.
+    cache_info = {"last_updated": (
+        fmt_ts(min(p["generated_at"] for p in drug_data_list))
+        if drug_data_list else now_str()
+    )}
     return render_template(
         "compare.html",
         drug_data_list=drug_data_list,
@@ -756,35 +1404,74 @@ def compare():
 
 
 # ── PDF generation ─────────────────────────────────────────────────────────────
-@app.route("/generate_pdf", methods=["POST"])
-def generate_pdf():
-    payload  = request.get_json(force=True)
-    filename = f"drug_repurposing_report_{int(time.time())}.pdf"
-    os.makedirs("static", exist_ok=True)
-    filepath = os.path.join("static", filename)
+# reportlab (fonts, pdfgen, platypus) is imported on first use, not at worker
+# boot — /generate_pdf is rare, and every other route then never pays its
+# import time or baseline RSS. Python caches the modules after first import.
+# The theme is likewise built once, on the first report.
+@functools.lru_cache(maxsize=1)
+def _pdf_theme() -> SimpleNamespace:
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    # Not used here: loaded now so every module _build_pdf imports is already
+    # in sys.modules before it runs on a native threadpool thread.
+    for mod in ("reportlab.lib.pagesizes", "reportlab.lib.units",
+                "reportlab.platypus"):
+        importlib.import_module(mod)
+
+    base = getSampleStyleSheet()
+    grid = colors.HexColor("#bdc9c8")
+    return SimpleNamespace(
+        styles={
+            "title": ParagraphStyle("rT", parent=base["Heading1"],
+                                     fontSize=20, spaceAfter=4, alignment=1),
+            "sub":   ParagraphStyle("rS", parent=base["Normal"],
+                                     fontSize=9, spaceAfter=3, alignment=1,
+                                     textColor=colors.HexColor("#444444")),
+            "h2":    ParagraphStyle("rH2", parent=base["Heading2"],
+                                     fontSize=12, spaceBefore=10, spaceAfter=4,
+                                     textColor=colors.HexColor("#006565")),
+            "body":  ParagraphStyle("rB", parent=base["Normal"],
+                                     fontSize=8.5, spaceAfter=4, leading=12),
+            "disc":  ParagraphStyle("rD", parent=base["Normal"],
+                                     fontSize=7, textColor=colors.grey, leading=10),
+        },
+        teal_hdr=colors.HexColor("#191c1e"),
+        row_even=colors.HexColor("#f2f4f6"),
+        grid=grid,
+        sev_colors={
+            "High":     colors.HexColor("#ffdad6"),
+            "Moderate": colors.HexColor("#fff8e1"),
+            "Low":      colors.HexColor("#e8f5e8"),
+        },
+        # Shared table commands — always concatenated into a fresh list.
+        base_tbl=(
+            ("FONTSIZE",      (0, 0), (-1, -1), 8.5),
+            ("TOPPADDING",    (0, 0), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+            ("GRID",          (0, 0), (-1, -1), 0.4, grid),
+        ),
+    )
+
+
+def _build_pdf(drugs: list, generated: str) -> bytes:
+    """Render the report for the given drug payloads; returns the PDF bytes."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import (
+        HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
+    )
+
+    # Built in memory and streamed back — nothing accumulates under static/.
+    buf = io.BytesIO()
 
     doc    = SimpleDocTemplate(
-        filepath, pagesize=letter,
+        buf, pagesize=letter,
         leftMargin=0.75 * inch, rightMargin=0.75 * inch,
         topMargin=1.0  * inch, bottomMargin=0.75 * inch,
     )
-    base = getSampleStyleSheet()
-    S = {
-        "title": ParagraphStyle("rT", parent=base["Heading1"],
-                                 fontSize=20, spaceAfter=4, alignment=1),
-        "sub":   ParagraphStyle("rS", parent=base["Normal"],
-                                 fontSize=9, spaceAfter=3, alignment=1,
-                                 textColor=colors.HexColor("#444444")),
-        "h2":    ParagraphStyle("rH2", parent=base["Heading2"],
-                                 fontSize=12, spaceBefore=10, spaceAfter=4,
-                                 textColor=colors.HexColor("#006565")),
-        "body":  ParagraphStyle("rB", parent=base["Normal"],
-                                 fontSize=8.5, spaceAfter=4, leading=12),
-        "src":   ParagraphStyle("rSrc", parent=base["Normal"],
-                                 fontSize=7.5, textColor=colors.grey),
-        "disc":  ParagraphStyle("rD", parent=base["Normal"],
-                                 fontSize=7, textColor=colors.grey, leading=10),
-    }
+    theme = _pdf_theme()
+    S     = theme.styles
 
     story = []
 
@@ -794,7 +1481,7 @@ def generate_pdf():
     story.append(Paragraph("Doctor of Pharmacy", S["sub"]))
     # ─────────────────────────────────────────────────────────────────────────
     story.append(Paragraph(
-        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}  |  "
+        f"Generated: {generated} UTC  |  "
         "Clinical Precision Dashboard v2.0",
         S["sub"],
     ))
@@ -803,25 +1490,7 @@ def generate_pdf():
         color=colors.HexColor("#008080"), spaceAfter=14,
     ))
 
-    teal_hdr   = colors.HexColor("#191c1e")
-    white_txt  = colors.white
-    row_even   = colors.HexColor("#f2f4f6")
-    grid_clr   = colors.HexColor("#bdc9c8")
-    sev_colors = {
-        "High":     colors.HexColor("#ffdad6"),
-        "Moderate": colors.HexColor("#fff8e1"),
-        "Low":      colors.HexColor("#e8f5e8"),
-    }
-
-    def _base_tbl_style():
-        return [
-            ("FONTSIZE",      (0, 0), (-1, -1), 8.5),
-            ("TOPPADDING",    (0, 0), (-1, -1), 4),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-            ("GRID",          (0, 0), (-1, -1), 0.4, grid_clr),
-        ]
-
-    for drug in payload.get("drugs", []):
+    for drug in drugs:
         name   = drug.get("name", "Unknown")
         conf   = drug.get("confidence", "N/A")
         ind    = drug.get("indication", "N/A")
@@ -831,8 +1500,9 @@ def generate_pdf():
         inter  = drug.get("interactions", [])
         src    = drug.get("source", "live")
 
+        # One Table per section; inter-section spacing rides on the tables'
+        # spaceAfter rather than separate Spacer flowables.
         story.append(Paragraph(f"Drug Profile — {name}", S["h2"]))
-        story.append(Paragraph(f"[Data source: {src}]", S["src"]))
 
         profile_rows = [
             ["Confidence Score",    f"{conf} %"],
@@ -840,16 +1510,16 @@ def generate_pdf():
             ["Mechanism of Action", mech],
             ["Molecular Formula",   mol.get("molecular_formula", mol.get("formula", "N/A"))],
             ["Molecular Weight",    mol.get("molecular_weight",  mol.get("weight",  "N/A"))],
+            ["Data Source",         src],
         ]
-        pt = Table(profile_rows, colWidths=[2.0 * inch, 4.7 * inch])
-        pt.setStyle(TableStyle(_base_tbl_style() + [
+        pt = Table(profile_rows, colWidths=[2.0 * inch, 4.7 * inch], spaceAfter=8)
+        pt.setStyle(TableStyle(list(theme.base_tbl) + [
             ("BACKGROUND",    (0, 0), (0, -1), colors.HexColor("#eceef0")),
             ("FONTNAME",      (0, 0), (0, -1), "Helvetica-Bold"),
             ("FONTNAME",      (1, 0), (1, -1), "Helvetica"),
-            ("ROWBACKGROUNDS",(0, 0), (-1, -1), [colors.white, row_even]),
+            ("ROWBACKGROUNDS",(0, 0), (-1, -1), [colors.white, theme.row_even]),
         ]))
         story.append(pt)
-        story.append(Spacer(1, 8))
 
         # Clinical Trials
         story.append(Paragraph("Clinical Trials", S["h2"]))
@@ -863,17 +1533,17 @@ def generate_pdf():
                     t.get("status", "N/A")[:18],
                     t.get("sponsor","N/A")[:22],
                 ])
-            ct = Table(ct_rows, colWidths=[1.5*inch, 1.2*inch, 1.7*inch, 2.3*inch])
-            ct.setStyle(TableStyle(_base_tbl_style() + [
-                ("BACKGROUND",    (0, 0), (-1, 0), teal_hdr),
-                ("TEXTCOLOR",     (0, 0), (-1, 0), white_txt),
+            ct = Table(ct_rows, colWidths=[1.5*inch, 1.2*inch, 1.7*inch, 2.3*inch],
+                       spaceAfter=8)
+            ct.setStyle(TableStyle(list(theme.base_tbl) + [
+                ("BACKGROUND",    (0, 0), (-1, 0), theme.teal_hdr),
+                ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
                 ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, row_even]),
+                ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, theme.row_even]),
             ]))
             story.append(ct)
         else:
             story.append(Paragraph("No clinical trials on record.", S["body"]))
-        story.append(Spacer(1, 8))
 
         # Drug Interactions
         story.append(Paragraph("Drug Interactions", S["h2"]))
@@ -888,13 +1558,13 @@ def generate_pdf():
                     ix.get("severity", "N/A"),
                     ix.get("description", "N/A"),
                 ])
-            cmd = _base_tbl_style() + [
-                ("BACKGROUND", (0, 0), (-1, 0), teal_hdr),
-                ("TEXTCOLOR",  (0, 0), (-1, 0), white_txt),
+            cmd = list(theme.base_tbl) + [
+                ("BACKGROUND", (0, 0), (-1, 0), theme.teal_hdr),
+                ("TEXTCOLOR",  (0, 0), (-1, 0), colors.white),
                 ("FONTNAME",   (0, 0), (-1, 0), "Helvetica-Bold"),
             ]
             for row_idx, ix in enumerate(inter_list, start=1):
-                bg = sev_colors.get(ix.get("severity", ""), colors.white)
+                bg = theme.sev_colors.get(ix.get("severity", ""), colors.white)
                 cmd.append(("BACKGROUND", (0, row_idx), (-1, row_idx), bg))
             it = Table(in_rows, colWidths=[1.9*inch, 1.0*inch, 3.8*inch])
             it.setStyle(TableStyle(cmd))
@@ -902,10 +1572,9 @@ def generate_pdf():
         else:
             story.append(Paragraph("No significant interactions recorded.", S["body"]))
 
-        story.append(Spacer(1, 14))
         story.append(HRFlowable(
             width="100%", thickness=0.4,
-            color=colors.HexColor("#bdc9c8"), spaceAfter=6,
+            color=colors.HexColor("#bdc9c8"), spaceBefore=14, spaceAfter=6,
         ))
 
     story.append(Spacer(1, 18))
@@ -918,15 +1587,49 @@ def generate_pdf():
     ))
 
     doc.build(story)
-    return jsonify({"filename": filename, "source": "live"})
+    return buf.getvalue()
+
+
+def _run_blocking(fn, *args):
+    """Run CPU-bound fn off the gevent hub when under gevent workers.
+
+    ReportLab layout never yields, so on the hub it would stall every other
+    request in the worker for the whole build. gevent's native threadpool runs
+    it on a real OS thread; the GIL switch interval lets the hub keep serving.
+    A process pool is avoided — a second RDKit-loaded interpreter exceeds 512 MB.
+    """
+    if _GEVENT:
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+@app.route("/generate_pdf", methods=["POST"])
+def generate_pdf():
+    payload = request.get_json(force=True)
+    _pdf_theme()        # first-call reportlab imports stay on the request thread
+    pdf = _run_blocking(_build_pdf, payload.get("drugs", []), now_str()[:16])
+    # Random suffix: unique even for reports requested in the same second.
+    filename = f"drug_repurposing_report_{secrets.token_hex(4)}.pdf"
+    return send_file(
+        io.BytesIO(pdf), mimetype="application/pdf",
+        as_attachment=True, download_name=filename,
+    )
 
 # ── Admin / health ────────────────────────────────────────────────────────────
 @app.route("/clear_cache", methods=["POST"])
 def clear_cache():
     with _lock:
         for c in (_pubchem_cache, _chembl_cache, _ct_cache, _ot_cache,
-                  _score_cache, _interact_cache, _cas_cache):
+                  _score_cache, _cas_cache, _short_cache, _revalidate_cache):
             c.clear()
+    if _redis is not None:
+        try:
+            keys = list(_redis.scan_iter(_REDIS_PREFIX + "*"))
+            if keys:
+                _redis.delete(*keys)
+        except redis.RedisError as exc:
+            log.warning("Redis clear: %s", exc)
     return jsonify({"status": "All LRU caches cleared", "source": "live"})
 
 
@@ -939,19 +1642,52 @@ def health():
             "ct":       len(_ct_cache),
             "ot":       len(_ot_cache),
             "scores":   len(_score_cache),
-            "interact": len(_interact_cache),
             "cas":      len(_cas_cache),
+            "short":    len(_short_cache),
+            "revalidate": len(_revalidate_cache),
         }
     return jsonify({
         "status":      "ok",
         "rdkit":       RDKIT_AVAILABLE,
+        "redis":       _redis is not None,
         "cache_sizes": sizes,
         "source":      "live",
     })
 
+# ── Startup cache warm-up ─────────────────────────────────────────────────────
+# Runs on a daemon thread at import so the first visitor doesn't pay the cold
+# upstream round-trips. Reference fingerprints are already built at import.
+# Opt-in via WARM_CACHE=1 (gunicorn.conf.py sets it) so scripts, tests and the
+# flask CLI can import the app without firing upstream traffic.
+_WARM_DRUGS = ("Metformin", "Aspirin", "Sildenafil")
+
+
+def warm_cache() -> None:
+    t0 = time.time()
+    try:
+        search_clinical_trials_batch(list(_WARM_DRUGS))
+        prefetch_drugs(list(_WARM_DRUGS))
+        for name in _WARM_DRUGS:
+            build_drug_profile(name)
+    except Exception as exc:
+        log.warning("Cache warm-up failed: %s", exc)
+        return
+    log.info("Cache warm-up done in %.1f s (%d drugs)", time.time() - t0, len(_WARM_DRUGS))
+
+
+def _start_warm_thread() -> None:
+    threading.Thread(target=warm_cache, name="warm-cache", daemon=True).start()
+
+
+if os.environ.get("WARM_CACHE") == "1":
+    _start_warm_thread()
+
 
 if __name__ == "__main__":
-    os.makedirs("static", exist_ok=True)
+    # Warm by default here too; WARM_CACHE=0 opts out, and WARM_CACHE=1 has
+    # already started the thread above.
+    if "WARM_CACHE" not in os.environ:
+        _start_warm_thread()
     app.run(
         debug=False,
         host="0.0.0.0",
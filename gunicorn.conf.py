@@ -0,0 +1,21 @@
+# gunicorn.conf.py — loaded automatically by `gunicorn app:app` (see Procfile).
+# gevent workers turn each blocking upstream call into a cooperative yield, so
+# concurrent visitors no longer queue behind one another's PubChem / ChEMBL /
+# ClinicalTrials round-trips.
+# Keep WEB_CONCURRENCY=1 on the 512 MB tier — concurrency comes from greenlets,
+# not processes (two workers × RDKit ≈ 240 MB → OOM).
+import os
+
+workers            = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class       = "gevent"
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 200))
+timeout            = 30
+
+# GUNICORN_WORKER tells app.py to monkey-patch before its first import;
+# WORKER_CONNECTIONS sizes its upstream fetch pool to match the line above;
+# WARM_CACHE starts the background cache warm-up (set WARM_CACHE=0 to skip).
+raw_env = [
+    "GUNICORN_WORKER=gevent",
+    f"WORKER_CONNECTIONS={worker_connections}",
+    f"WARM_CACHE={os.environ.get('WARM_CACHE', '1')}",
+]